@@ -1,10 +1,19 @@
+import json
+import logging
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 
 from pydantic import PrivateAttr
 from crewai.tools.base_tool import BaseTool
 from jira import JIRA
 
+_SUBTASK_QUERY_CHUNK_SIZE = 100
+
+# Out-of-sprint subtask id -> {"estimate", "checked_at"}; lives for the process so scheduled runs reuse it.
+_subtask_estimate_cache: dict[str, dict] = {}
+
 
 class JiraSprintMetricsTool(BaseTool):
     name: str = "jira_sprint_metrics"
@@ -13,6 +22,7 @@ class JiraSprintMetricsTool(BaseTool):
     _board_ids: list[str] = PrivateAttr(default_factory=list)
     _board_name_map: dict[str, str] = PrivateAttr(default_factory=dict)
     _base_url: str = PrivateAttr(default="")
+    _collect_processes: int = PrivateAttr(default=1)
 
     def model_post_init(self, __context):
         super().model_post_init(__context)
@@ -29,6 +39,7 @@ class JiraSprintMetricsTool(BaseTool):
         self._board_name_map = self._parse_board_name_map(
             os.getenv("JIRA_BOARD_NAME_MAP", os.getenv("JIRA_BOARD_NAMES", ""))
         )
+        self._collect_processes = max(int(os.getenv("JIRA_COLLECT_PROCESSES", "1")), 1)
 
     @staticmethod
     def _parse_board_name_map(raw_value: str) -> dict[str, str]:
@@ -80,13 +91,11 @@ class JiraSprintMetricsTool(BaseTool):
         transitions.sort(key=lambda t: t["changed_at"] or datetime.min.replace(tzinfo=timezone.utc))
         return transitions
 
-    def _issue_original_estimate_seconds(self, issue, subtask_estimates: dict[str, int]) -> tuple[int, bool]:
-        issue_original = getattr(issue.fields, "timeoriginalestimate", None)
-        if issue_original is not None:
-            return int(issue_original), False
+    def _issue_original_estimate_seconds(self, issue: dict, subtask_estimates: dict[str, int]) -> tuple[int, bool]:
+        if issue["original_estimate_seconds"] is not None:
+            return issue["original_estimate_seconds"], False
 
-        subtask_ids = [getattr(subtask, "id", None) for subtask in getattr(issue.fields, "subtasks", [])]
-        subtask_sum = sum(subtask_estimates.get(subtask_id, 0) for subtask_id in subtask_ids if subtask_id)
+        subtask_sum = sum(subtask_estimates.get(subtask_id, 0) for subtask_id in issue["subtask_ids"])
         return subtask_sum, subtask_sum > 0
 
     def _to_seconds(self, value: float) -> int:
@@ -94,159 +103,309 @@ class JiraSprintMetricsTool(BaseTool):
 
     def _run(self) -> list[dict]:
         now = datetime.now(timezone.utc)
-        metrics = []
-        for board_id in self._board_ids:
-            board_name = self._board_name_map.get(board_id, board_id)
-            board_info = {
-                "board_id": board_id,
-                "board_name": board_name,
-                "team_name": board_name,
-                "sprints": [],
-            }
+        shard_count = min(self._collect_processes, len(self._board_ids))
+        if shard_count > 1:
+            return self._collect_boards_sharded(self._board_ids, now, shard_count)
+        return self._collect_boards(self._board_ids, now)
+
+    def _collect_boards_sharded(self, board_ids: list[str], now: datetime, shard_count: int) -> list[dict]:
+        # Contiguous shards keep the original board order when results are concatenated.
+        shard_size = -(-len(board_ids) // shard_count)
+        shards = [board_ids[start:start + shard_size] for start in range(0, len(board_ids), shard_size)]
+        fetched: dict = {"boards": [], "subtask_estimates": {}, "referenced_subtask_ids": []}
+        # Spawn rather than fork: this runs in a scheduler thread next to crewai's own threads.
+        with ProcessPoolExecutor(
+            max_workers=len(shards),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_shard_worker,
+        ) as executor:
+            futures = [executor.submit(_fetch_shard, shard, now.isoformat()) for shard in shards]
+            for shard, future in zip(shards, futures):
+                try:
+                    shard_fetched = json.loads(future.result())
+                except Exception as exc:  # noqa: BLE001 - surface upstream
+                    for board_id in shard:
+                        board_info = self._empty_board_info(board_id)
+                        board_info["error"] = str(exc)
+                        fetched["boards"].append({"board_info": board_info, "sprints": []})
+                    continue
+                fetched["boards"].extend(shard_fetched["boards"])
+                fetched["subtask_estimates"].update(shard_fetched["subtask_estimates"])
+                fetched["referenced_subtask_ids"].extend(shard_fetched["referenced_subtask_ids"])
+        # Subtask rollup runs once in the parent so shared subtasks are fetched once per run.
+        return self._reduce_boards(fetched)
+
+    def _collect_boards(self, board_ids: list[str], now: datetime) -> list[dict]:
+        return self._reduce_boards(self._fetch_boards(board_ids, now))
+
+    def _empty_board_info(self, board_id: str) -> dict:
+        board_name = self._board_name_map.get(board_id, board_id)
+        return {
+            "board_id": board_id,
+            "board_name": board_name,
+            "team_name": board_name,
+            "sprints": [],
+        }
+
+    def _fetch_boards(self, board_ids: list[str], now: datetime) -> dict:
+        boards: list[dict] = []
+        subtask_estimates: dict[str, int] = {}
+        referenced_subtask_ids: set[str] = set()
+        for board_id in board_ids:
+            board_info = self._empty_board_info(board_id)
+            sprint_records: list[dict] = []
             try:
-                sprints = self._client.sprints(board_id, state="active")
-                for sprint in sprints:
-                    issues = self._client.search_issues(
-                        f"Sprint = {sprint.id}",
-                        maxResults=False,
-                        expand="changelog",
-                        fields="summary,status,timeoriginalestimate,subtasks,issuetype,created",
-                    )
-                    subtask_estimates: dict[str, int] = {}
-                    for issue in issues:
-                        issue_type = getattr(getattr(issue, "fields", None), "issuetype", None)
-                        if not issue_type or not getattr(issue_type, "subtask", False):
-                            continue
-                        original = getattr(issue.fields, "timeoriginalestimate", None)
-                        subtask_estimates[issue.id] = int(original) if original is not None else 0
-
-                    total_original_seconds = 0
-                    done_original_seconds = 0
-                    in_progress_issues = 0
-                    fallback_to_subtasks_count = 0
-                    status_bottlenecks: dict[str, dict] = {}
-                    issue_snapshots: list[dict] = []
-
-                    for issue in issues:
-                        issue_type = getattr(getattr(issue, "fields", None), "issuetype", None)
-                        is_subtask = bool(issue_type and getattr(issue_type, "subtask", False))
-                        if is_subtask:
+                for sprint in self._client.sprints(board_id, state="active"):
+                    issues: list[dict] = []
+                    for issue in self._search_sprint_issues(sprint):
+                        if self._is_subtask(issue):
                             # Roll up estimate/progress through parent issues to avoid double counting.
+                            original = getattr(issue.fields, "timeoriginalestimate", None)
+                            subtask_estimates[issue.id] = int(original) if original is not None else 0
                             continue
-
-                        status = getattr(getattr(issue, "fields", None), "status", None)
-                        status_name = getattr(status, "name", "Unknown")
-                        status_category = getattr(getattr(status, "statusCategory", None), "key", "unknown")
-                        transitions = self._extract_status_transitions(issue)
-
-                        current_status_changed_at = transitions[-1]["changed_at"] if transitions else None
-                        current_status_duration_seconds = self._to_seconds(
-                            (now - current_status_changed_at).total_seconds()
-                        ) if current_status_changed_at else 0
-
-                        work_start_at = None
-                        for transition in transitions:
-                            to_status = transition["to_status"] or ""
-                            if to_status.lower() not in {"to do", "open", "backlog", "selected for development"}:
-                                work_start_at = transition["changed_at"]
-                                break
-
-                        if not work_start_at and status_category == "indeterminate":
-                            work_start_at = self._parse_jira_datetime(getattr(issue.fields, "created", None))
-
-                        time_in_work_seconds = self._to_seconds((now - work_start_at).total_seconds()) if work_start_at else 0
-                        is_in_progress = status_category == "indeterminate"
-                        if is_in_progress:
-                            in_progress_issues += 1
-
-                        estimate_seconds, used_subtasks_fallback = self._issue_original_estimate_seconds(
-                            issue,
-                            subtask_estimates,
-                        )
-                        if used_subtasks_fallback:
-                            fallback_to_subtasks_count += 1
-
-                        total_original_seconds += estimate_seconds
-                        if status_category == "done":
-                            done_original_seconds += estimate_seconds
-
-                        if status_category != "done":
-                            bucket = status_bottlenecks.setdefault(
-                                status_name,
-                                {"issues": 0, "max_time_in_status_seconds": 0, "avg_time_in_status_seconds": 0},
-                            )
-                            bucket["issues"] += 1
-                            bucket["avg_time_in_status_seconds"] += current_status_duration_seconds
-                            bucket["max_time_in_status_seconds"] = max(
-                                bucket["max_time_in_status_seconds"],
-                                current_status_duration_seconds,
-                            )
-
-                        issue_snapshots.append(
-                            {
-                                "key": issue.key,
-                                "summary": getattr(issue.fields, "summary", "") or "",
-                                "issue_url": f"{self._base_url}/browse/{issue.key}",
-                                "status": status_name,
-                                "status_category": status_category,
-                                "original_estimate_seconds": estimate_seconds,
-                                "used_subtasks_estimate": used_subtasks_fallback,
-                                "time_in_work_seconds": time_in_work_seconds,
-                                "time_in_current_status_seconds": current_status_duration_seconds,
-                            }
-                        )
-
-                    for bucket in status_bottlenecks.values():
-                        if bucket["issues"] > 0:
-                            bucket["avg_time_in_status_seconds"] = int(
-                                bucket["avg_time_in_status_seconds"] / bucket["issues"]
-                            )
-
-                    stuck_status = None
-                    if status_bottlenecks:
-                        stuck_status = max(
-                            status_bottlenecks.items(),
-                            key=lambda item: (
-                                item[1]["max_time_in_status_seconds"],
-                                item[1]["issues"],
-                            ),
-                        )[0]
-
-                    board_info["sprints"].append(
-                        {
-                            "sprint_name": sprint.name,
-                            "completed_issues": len(
-                                [
-                                    i
-                                    for i in issues
-                                    if not getattr(getattr(i.fields, "issuetype", None), "subtask", False)
-                                    and i.fields.status.statusCategory.key == "done"
-                                ]
-                            ),
-                            "total_issues": len(
-                                [
-                                    i
-                                    for i in issues
-                                    if not getattr(getattr(i.fields, "issuetype", None), "subtask", False)
-                                ]
-                            ),
-                            "state": sprint.state,
-                            "estimate_source": "original_estimate",
-                            "total_original_estimate_seconds": total_original_seconds,
-                            "done_original_estimate_seconds": done_original_seconds,
-                            "completion_by_original_estimate": (
-                                round(done_original_seconds / total_original_seconds, 4)
-                                if total_original_seconds > 0
-                                else None
-                            ),
-                            "issues_in_progress": in_progress_issues,
-                            "issues_with_subtasks_estimate_fallback": fallback_to_subtasks_count,
-                            "stuck_status": stuck_status,
-                            "status_bottlenecks": status_bottlenecks,
-                            "issue_snapshots": issue_snapshots,
-                        }
-                    )
+                        compact_issue = self._compact_issue(issue, now)
+                        referenced_subtask_ids.update(compact_issue["subtask_ids"])
+                        issues.append(compact_issue)
+                    sprint_records.append({"sprint_name": sprint.name, "state": sprint.state, "issues": issues})
             except Exception as exc:  # noqa: BLE001 - surface upstream
                 board_info["error"] = str(exc)
+            boards.append({"board_info": board_info, "sprints": sprint_records})
+        return {
+            "boards": boards,
+            "subtask_estimates": subtask_estimates,
+            "referenced_subtask_ids": sorted(referenced_subtask_ids),
+        }
+
+    def _search_sprint_issues(self, sprint) -> list:
+        return self._client.search_issues(
+            f"Sprint = {sprint.id}",
+            maxResults=False,
+            expand="changelog",
+            fields="summary,status,timeoriginalestimate,subtasks,issuetype,created",
+        )
+
+    @staticmethod
+    def _is_subtask(issue) -> bool:
+        issue_type = getattr(getattr(issue, "fields", None), "issuetype", None)
+        return bool(issue_type and getattr(issue_type, "subtask", False))
+
+    def _compact_issue(self, issue, now: datetime) -> dict:
+        status = getattr(getattr(issue, "fields", None), "status", None)
+        status_name = getattr(status, "name", "Unknown")
+        status_category = getattr(getattr(status, "statusCategory", None), "key", "unknown")
+        transitions = self._extract_status_transitions(issue)
+
+        current_status_changed_at = transitions[-1]["changed_at"] if transitions else None
+        current_status_duration_seconds = self._to_seconds(
+            (now - current_status_changed_at).total_seconds()
+        ) if current_status_changed_at else 0
+
+        work_start_at = None
+        for transition in transitions:
+            to_status = transition["to_status"] or ""
+            if to_status.lower() not in {"to do", "open", "backlog", "selected for development"}:
+                work_start_at = transition["changed_at"]
+                break
+
+        if not work_start_at and status_category == "indeterminate":
+            work_start_at = self._parse_jira_datetime(getattr(issue.fields, "created", None))
+
+        issue_original = getattr(issue.fields, "timeoriginalestimate", None)
+        subtask_ids: list[str] = []
+        if issue_original is None:
+            subtask_ids = [
+                subtask.id for subtask in getattr(issue.fields, "subtasks", []) if getattr(subtask, "id", None)
+            ]
+        return {
+            "key": issue.key,
+            "summary": getattr(issue.fields, "summary", "") or "",
+            "status": status_name,
+            "status_category": status_category,
+            "original_estimate_seconds": int(issue_original) if issue_original is not None else None,
+            "subtask_ids": subtask_ids,
+            "time_in_work_seconds": self._to_seconds((now - work_start_at).total_seconds()) if work_start_at else 0,
+            "time_in_current_status_seconds": current_status_duration_seconds,
+        }
+
+    def _reduce_boards(self, fetched: dict) -> list[dict]:
+        subtask_estimates, failed_subtask_ids = self._rollup_subtask_estimates(
+            fetched["subtask_estimates"],
+            set(fetched["referenced_subtask_ids"]),
+        )
+        metrics: list[dict] = []
+        for board in fetched["boards"]:
+            board_info = board["board_info"]
+            board_failed_ids: set[str] = set()
+            for sprint_record in board["sprints"]:
+                board_info["sprints"].append(self._sprint_metrics(sprint_record, subtask_estimates))
+                for issue in sprint_record["issues"]:
+                    board_failed_ids.update(failed_subtask_ids.intersection(issue["subtask_ids"]))
+            if board_failed_ids:
+                message = f"Failed to fetch subtask estimates for ids {','.join(sorted(board_failed_ids))}"
+                board_info["error"] = f"{board_info['error']}; {message}" if "error" in board_info else message
             metrics.append(board_info)
         return metrics
+
+    def _rollup_subtask_estimates(
+        self,
+        in_sprint_estimates: dict[str, int],
+        referenced_subtask_ids: set[str],
+    ) -> tuple[dict[str, int], set[str]]:
+        missing_ids = referenced_subtask_ids - in_sprint_estimates.keys()
+        # Keep only out-of-sprint subtasks referenced by this run; everything else is re-read or gone.
+        for subtask_id in list(_subtask_estimate_cache):
+            if subtask_id not in missing_ids:
+                del _subtask_estimate_cache[subtask_id]
+
+        cached_ids = sorted(subtask_id for subtask_id in missing_ids if subtask_id in _subtask_estimate_cache)
+        uncached_ids = sorted(subtask_id for subtask_id in missing_ids if subtask_id not in _subtask_estimate_cache)
+        failed_ids = self._bulk_search_subtasks(cached_ids, revalidate=True)
+        failed_ids |= self._bulk_search_subtasks(uncached_ids, revalidate=False)
+
+        estimates = dict(in_sprint_estimates)
+        for subtask_id in missing_ids:
+            if subtask_id in _subtask_estimate_cache:
+                estimates[subtask_id] = _subtask_estimate_cache[subtask_id]["estimate"]
+        return estimates, failed_ids
+
+    def _bulk_search_subtasks(self, subtask_ids: list[str], revalidate: bool) -> set[str]:
+        failed_ids: set[str] = set()
+        for start in range(0, len(subtask_ids), _SUBTASK_QUERY_CHUNK_SIZE):
+            chunk = subtask_ids[start:start + _SUBTASK_QUERY_CHUNK_SIZE]
+            jql = f"id in ({','.join(chunk)})"
+            # Taken right before the query so the window below always overlaps the previous check.
+            checked_at = datetime.now(timezone.utc).timestamp()
+            if revalidate:
+                oldest_check = min(_subtask_estimate_cache[subtask_id]["checked_at"] for subtask_id in chunk)
+                # Relative JQL dates sidestep the Jira user's timezone; the extra minutes cover clock skew.
+                minutes = int((checked_at - oldest_check) // 60) + 2
+                jql += f' AND updated >= "-{minutes}m"'
+            try:
+                # Without validation, deleted or hidden ids are skipped instead of failing the whole chunk.
+                issues = self._client.search_issues(
+                    jql,
+                    maxResults=False,
+                    fields="timeoriginalestimate",
+                    validate_query=False,
+                )
+            except Exception:  # noqa: BLE001 - reported on the affected boards
+                logging.warning("Failed to fetch subtask estimates for ids %s.", ",".join(chunk), exc_info=True)
+                failed_ids.update(chunk)
+                continue
+            for issue in issues:
+                original = getattr(issue.fields, "timeoriginalestimate", None)
+                _subtask_estimate_cache[issue.id] = {
+                    "estimate": int(original) if original is not None else 0,
+                    "checked_at": checked_at,
+                }
+            # Cached subtasks missing from an updated-filtered result are unchanged since their last check.
+            for subtask_id in chunk:
+                if subtask_id in _subtask_estimate_cache:
+                    _subtask_estimate_cache[subtask_id]["checked_at"] = checked_at
+        return failed_ids
+
+    def _sprint_metrics(self, sprint_record: dict, subtask_estimates: dict[str, int]) -> dict:
+        total_issues = 0
+        completed_issues = 0
+        total_original_seconds = 0
+        done_original_seconds = 0
+        in_progress_issues = 0
+        fallback_to_subtasks_count = 0
+        status_bottlenecks: dict[str, dict] = {}
+        issue_snapshots: list[dict] = []
+
+        for issue in sprint_record["issues"]:
+            status_name = issue["status"]
+            status_category = issue["status_category"]
+            current_status_duration_seconds = issue["time_in_current_status_seconds"]
+            if status_category == "indeterminate":
+                in_progress_issues += 1
+
+            estimate_seconds, used_subtasks_fallback = self._issue_original_estimate_seconds(
+                issue,
+                subtask_estimates,
+            )
+            if used_subtasks_fallback:
+                fallback_to_subtasks_count += 1
+
+            total_issues += 1
+            total_original_seconds += estimate_seconds
+            if status_category == "done":
+                completed_issues += 1
+                done_original_seconds += estimate_seconds
+
+            if status_category != "done":
+                bucket = status_bottlenecks.setdefault(
+                    status_name,
+                    {"issues": 0, "max_time_in_status_seconds": 0, "avg_time_in_status_seconds": 0},
+                )
+                bucket["issues"] += 1
+                bucket["avg_time_in_status_seconds"] += current_status_duration_seconds
+                bucket["max_time_in_status_seconds"] = max(
+                    bucket["max_time_in_status_seconds"],
+                    current_status_duration_seconds,
+                )
+
+            issue_snapshots.append(
+                {
+                    "key": issue["key"],
+                    "summary": issue["summary"],
+                    "issue_url": f"{self._base_url}/browse/{issue['key']}",
+                    "status": status_name,
+                    "status_category": status_category,
+                    "original_estimate_seconds": estimate_seconds,
+                    "used_subtasks_estimate": used_subtasks_fallback,
+                    "time_in_work_seconds": issue["time_in_work_seconds"],
+                    "time_in_current_status_seconds": current_status_duration_seconds,
+                }
+            )
+
+        for bucket in status_bottlenecks.values():
+            if bucket["issues"] > 0:
+                bucket["avg_time_in_status_seconds"] = int(
+                    bucket["avg_time_in_status_seconds"] / bucket["issues"]
+                )
+
+        stuck_status = None
+        if status_bottlenecks:
+            stuck_status = max(
+                status_bottlenecks.items(),
+                key=lambda item: (
+                    item[1]["max_time_in_status_seconds"],
+                    item[1]["issues"],
+                ),
+            )[0]
+
+        return {
+            "sprint_name": sprint_record["sprint_name"],
+            "completed_issues": completed_issues,
+            "total_issues": total_issues,
+            "state": sprint_record["state"],
+            "estimate_source": "original_estimate",
+            "total_original_estimate_seconds": total_original_seconds,
+            "done_original_estimate_seconds": done_original_seconds,
+            "completion_by_original_estimate": (
+                round(done_original_seconds / total_original_seconds, 4)
+                if total_original_seconds > 0
+                else None
+            ),
+            "issues_in_progress": in_progress_issues,
+            "issues_with_subtasks_estimate_fallback": fallback_to_subtasks_count,
+            "stuck_status": stuck_status,
+            "status_bottlenecks": status_bottlenecks,
+            "issue_snapshots": issue_snapshots,
+        }
+
+
+_shard_tool: JiraSprintMetricsTool | None = None
+
+
+def _init_shard_worker() -> None:
+    # Jira clients hold sessions and cannot be pickled; each worker builds its own from the environment.
+    global _shard_tool
+    _shard_tool = JiraSprintMetricsTool()
+
+
+def _fetch_shard(board_ids: list[str], now_iso: str) -> str:
+    now = datetime.fromisoformat(now_iso)
+    return json.dumps(_shard_tool._fetch_boards(board_ids, now), separators=(",", ":"))